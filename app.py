@@ -1,25 +1,65 @@
 # Flask backend for IoT Control
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, Response
 import paho.mqtt.client as mqtt
 import sqlite3
+import csv
+import io
+import json
+import heapq
+import zlib
+import math
+from array import array
 from datetime import datetime
 import threading
 import time
 import os
 from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv('config.env')
+from profiler import SamplingProfiler, IngestTimings, format_collapsed
 
 app = Flask(__name__)
 
-# MQTT setup from environment variables
-mqttBroker = os.getenv('MQTT_BROKER', 'vdd11821.ala.us-east-1.emqxsl.com')
-mqttPort = int(os.getenv('MQTT_PORT', 8883))
-mqttUser = os.getenv('MQTT_USERNAME', 'octiu123')
-mqttPassword = os.getenv('MQTT_PASSWORD', 'octiu123')
-caCertPath = os.getenv('CA_CERT_PATH', 'emqxsl-ca.crt')
-mqttClient = mqtt.Client()
+# MQTT and database settings, populated by create_app()
+mqttBroker = None
+mqttPort = None
+mqttUser = None
+mqttPassword = None
+caCertPath = None
+dbPath = 'iot_data.db'
+mqttClient = None
+
+def load_config(overrides=None):
+    """Read settings from config.env / environment, then apply overrides"""
+    load_dotenv('config.env')
+    config = {
+        'MQTT_BROKER': os.getenv('MQTT_BROKER', 'vdd11821.ala.us-east-1.emqxsl.com'),
+        'MQTT_PORT': int(os.getenv('MQTT_PORT', 8883)),
+        'MQTT_USERNAME': os.getenv('MQTT_USERNAME', 'octiu123'),
+        'MQTT_PASSWORD': os.getenv('MQTT_PASSWORD', 'octiu123'),
+        'CA_CERT_PATH': os.getenv('CA_CERT_PATH', 'emqxsl-ca.crt'),
+        'DATABASE_PATH': os.getenv('DATABASE_PATH', 'iot_data.db'),
+        'MQTT_CONNECT_TIMEOUT': float(os.getenv('MQTT_CONNECT_TIMEOUT', 10)),
+        'RECENT_BUCKET_SECONDS': int(os.getenv('RECENT_BUCKET_SECONDS', 60)),
+        'RECENT_HOURS': int(os.getenv('RECENT_HOURS', 24)),
+        'BOARD_ROOMS': os.getenv('BOARD_ROOMS', ''),
+        'SUMMARY_MOTION_WINDOW': int(os.getenv('SUMMARY_MOTION_WINDOW', 3600)),
+        'SUMMARY_TTL': float(os.getenv('SUMMARY_TTL', 5)),
+        'DEDUP_WINDOW': int(os.getenv('DEDUP_WINDOW', 256)),
+        'REORDER_DEPTH': int(os.getenv('REORDER_DEPTH', 4)),
+        'REORDER_WAIT': float(os.getenv('REORDER_WAIT', 5)),
+        'DEADBAND': os.getenv('DEADBAND', ''),
+        'DEADBAND_HEARTBEAT': float(os.getenv('DEADBAND_HEARTBEAT', 300)),
+        'CONTROL_CLIENT_RATE': float(os.getenv('CONTROL_CLIENT_RATE', 5)),
+        'CONTROL_CLIENT_BURST': int(os.getenv('CONTROL_CLIENT_BURST', 10)),
+        'CONTROL_DEVICE_RATE': float(os.getenv('CONTROL_DEVICE_RATE', 2)),
+        'CONTROL_DEVICE_BURST': int(os.getenv('CONTROL_DEVICE_BURST', 5)),
+        'CONTROL_DEBOUNCE_MS': int(os.getenv('CONTROL_DEBOUNCE_MS', 250)),
+        'DEBUG_PROFILER': os.getenv('DEBUG_PROFILER', 'False').lower() == 'true',
+        'PROFILE_INTERVAL_MS': float(os.getenv('PROFILE_INTERVAL_MS', 5)),
+        'PROFILE_MAX_SECONDS': float(os.getenv('PROFILE_MAX_SECONDS', 60)),
+    }
+    if overrides:
+        config.update(overrides)
+    return config
 
 # Global device status with persistent storage (Multi-board)
 device_status = {
@@ -51,12 +91,402 @@ sensor_data = {
     }
 }
 
+class BucketRing:
+    """Fixed-size ring of time buckets for one metric, backed by typed arrays.
+    
+    A reading lands in slot (bucket id % size); a slot still holding an older
+    bucket is reset first, so memory is fixed and old data ages out without
+    any cleanup pass. Readings older than the bucket in their slot are dropped.
+    """
+    def __init__(self, bucket_seconds, size):
+        self.bucket_seconds = bucket_seconds
+        self.size = size
+        self.bucket_ids = array('q', [-1]) * size
+        self.counts = array('I', [0]) * size
+        self.sums = array('d', [0.0]) * size
+        self.mins = array('d', [0.0]) * size
+        self.maxs = array('d', [0.0]) * size
+    
+    def add(self, epoch, value):
+        bucket_id = int(epoch // self.bucket_seconds)
+        slot = bucket_id % self.size
+        if bucket_id < self.bucket_ids[slot]:
+            # Late reading older than the window, must not evict a newer bucket
+            return
+        if self.bucket_ids[slot] != bucket_id:
+            self.bucket_ids[slot] = bucket_id
+            self.counts[slot] = 1
+            self.sums[slot] = self.mins[slot] = self.maxs[slot] = value
+            return
+        self.counts[slot] += 1
+        self.sums[slot] += value
+        if value < self.mins[slot]:
+            self.mins[slot] = value
+        if value > self.maxs[slot]:
+            self.maxs[slot] = value
+    
+    def series(self, since, now):
+        """Return timestamps/avg/min/max lists for non-empty buckets in [since, now]"""
+        first = int(since // self.bucket_seconds)
+        last = int(now // self.bucket_seconds)
+        first = max(first, last - self.size + 1)
+        result = {'timestamps': [], 'avg': [], 'min': [], 'max': []}
+        for bucket_id in range(first, last + 1):
+            slot = bucket_id % self.size
+            if self.bucket_ids[slot] != bucket_id or self.counts[slot] == 0:
+                continue
+            result['timestamps'].append(datetime.fromtimestamp(bucket_id * self.bucket_seconds).isoformat())
+            result['avg'].append(round(self.sums[slot] / self.counts[slot], 2))
+            result['min'].append(self.mins[slot])
+            result['max'].append(self.maxs[slot])
+        return result
+
+# Recent history per board and metric, allocated by create_app()
+recent_history = {}
+recent_history_lock = threading.Lock()
+
+def init_recent_history(bucket_seconds, hours):
+    """Allocate one ring per (board, metric) covering the configured window"""
+    size = max(1, hours * 3600 // bucket_seconds)
+    with recent_history_lock:
+        for board in sensor_data:
+            recent_history[board] = {
+                metric: BucketRing(bucket_seconds, size)
+                for metric in ('motion', 'humidity', 'light_level', 'temperature')
+            }
+
+def record_recent_history(board, epoch, motion, humidity, light_level, temperature):
+    """Add a reading to the in-memory rings (same filtering as store_sensor_data)"""
+    rings = recent_history.get(board)
+    if rings is None:
+        return
+    with recent_history_lock:
+        if motion is not None:
+            rings['motion'].add(epoch, 1.0 if motion else 0.0)
+        if humidity is not None and humidity != 0:
+            rings['humidity'].add(epoch, humidity)
+        if light_level is not None:
+            rings['light_level'].add(epoch, light_level)
+        if temperature is not None and temperature != 0:
+            rings['temperature'].add(epoch, temperature)
+
+class SlidingCounter:
+    """Event count over a sliding time window, kept in a fixed number of time buckets"""
+    def __init__(self, window_seconds, buckets=60):
+        self.bucket_seconds = window_seconds / buckets
+        self.size = buckets
+        self.bucket_ids = array('q', [-1]) * buckets
+        self.counts = array('I', [0]) * buckets
+        self.total = 0
+    
+    def add(self, epoch, count=1):
+        bucket_id = int(epoch // self.bucket_seconds)
+        slot = bucket_id % self.size
+        if bucket_id < self.bucket_ids[slot]:
+            # Late event older than the window, must not evict a newer bucket
+            return
+        if self.bucket_ids[slot] != bucket_id:
+            # Slot holds a bucket that has left the window
+            self.total -= self.counts[slot]
+            self.bucket_ids[slot] = bucket_id
+            self.counts[slot] = 0
+        self.counts[slot] += count
+        self.total += count
+    
+    def expire(self, epoch):
+        """Drop buckets older than the window and return the current total"""
+        oldest = int(epoch // self.bucket_seconds) - self.size + 1
+        for slot in range(self.size):
+            if self.bucket_ids[slot] != -1 and self.bucket_ids[slot] < oldest:
+                self.total -= self.counts[slot]
+                self.bucket_ids[slot] = -1
+                self.counts[slot] = 0
+        return self.total
+
+# Fleet summary maintained incrementally by on_message and the control routes
+summary_lock = threading.Lock()
+board_rooms = {}
+summary_rooms = {}
+summary_latest = {}
+devices_on = set()
+summary_windowed = {'computed_at': 0.0, 'motion_events': {}}
+summary_settings = {'ttl': 5.0, 'motion_window': 3600}
+
+def init_summary(rooms_setting, motion_window, ttl):
+    """Build per-room accumulators; rooms_setting is 'board:Room,board:Room'"""
+    with summary_lock:
+        board_rooms.clear()
+        for entry in filter(None, (item.strip() for item in rooms_setting.split(','))):
+            board, _, room = entry.partition(':')
+            board_rooms[board.strip()] = room.strip() or board.strip()
+        summary_settings['ttl'] = ttl
+        summary_settings['motion_window'] = motion_window
+        summary_rooms.clear()
+        summary_latest.clear()
+        for board in sensor_data:
+            room = board_rooms.setdefault(board, board)
+            summary_rooms.setdefault(room, {
+                'boards': [],
+                'temperature_sum': 0.0,
+                'temperature_count': 0,
+                'humidity_sum': 0.0,
+                'humidity_count': 0,
+                'motion': SlidingCounter(motion_window)
+            })['boards'].append(board)
+            summary_latest[board] = {'temperature': None, 'humidity': None, 'motion': False}
+        summary_windowed['computed_at'] = 0.0
+
+def update_summary_reading(board, epoch, motion, humidity, temperature):
+    """Apply one reading to the room averages and motion counter in O(1)"""
+    latest = summary_latest.get(board)
+    if latest is None:
+        return
+    with summary_lock:
+        room = summary_rooms[board_rooms[board]]
+        # Each board contributes its latest value to the room average
+        for metric, value in (('temperature', temperature), ('humidity', humidity)):
+            if value is None or value == 0:
+                continue
+            previous = latest[metric]
+            if previous is None:
+                room[f'{metric}_count'] += 1
+                room[f'{metric}_sum'] += value
+            else:
+                room[f'{metric}_sum'] += value - previous
+            latest[metric] = value
+        # A motion event is a transition from no motion to motion
+        if motion and not latest['motion']:
+            room['motion'].add(epoch)
+        latest['motion'] = bool(motion)
+
+def update_summary_device(board, device, status):
+    """Track which devices are currently on"""
+    with summary_lock:
+        if status == 'on':
+            devices_on.add((board, device))
+        else:
+            devices_on.discard((board, device))
+
+class SequenceTracker:
+    """Duplicate filter and reorder buffer for one board's sensor sequence numbers.
+    
+    Seen sequence numbers are kept as a bitmap over the last `window` values
+    (bit i means highest - i was seen), so QoS 1 redeliveries are dropped
+    without a database lookup. Readings that arrive ahead of a gap wait in a
+    small heap until the gap fills, `depth` readings queue up, or the oldest
+    has waited `max_wait` seconds.
+    """
+    def __init__(self, window=256, depth=4, max_wait=5.0):
+        self.window = window
+        self.mask = (1 << window) - 1
+        self.depth = depth
+        self.max_wait = max_wait
+        self.boot = None
+        self.highest = None
+        self.seen = 0
+        self.next_seq = None
+        self.pending = []
+        self.last_was_duplicate = False
+        self.stats = {'duplicates': 0, 'held': 0, 'skipped': 0, 'restarts': 0}
+    
+    def reset(self, seq, boot):
+        if boot is not None:
+            self.boot = boot
+        self.highest = seq
+        self.seen = 1
+        self.next_seq = seq
+    
+    def push(self, seq, reading, now, boot=None):
+        """Register a reading and return the readings now ready, in sequence order"""
+        self.last_was_duplicate = False
+        released = []
+        if self.highest is None:
+            self.reset(seq, boot)
+        elif (boot is not None and boot != self.boot) or self.highest - seq >= self.window:
+            # Device rebooted (new boot id, or counter fell far behind)
+            self.stats['restarts'] += 1
+            released = [item[2] for item in sorted(self.pending)]
+            self.pending = []
+            self.reset(seq, boot)
+        elif seq > self.highest:
+            if seq - self.highest >= self.window:
+                # Jumped past the whole window; shifting would only grow the int
+                self.seen = 1
+            else:
+                self.seen = ((self.seen << (seq - self.highest)) | 1) & self.mask
+            self.highest = seq
+        else:
+            bit = 1 << (self.highest - seq)
+            if self.seen & bit:
+                self.stats['duplicates'] += 1
+                self.last_was_duplicate = True
+                return released
+            self.seen |= bit
+        
+        if seq < self.next_seq:
+            # Its successors were already released; pass it through as late
+            released.append(reading)
+            return released
+        if seq > self.next_seq:
+            self.stats['held'] += 1
+        heapq.heappush(self.pending, (seq, now, reading))
+        released.extend(self.drain(now))
+        return released
+    
+    def drain(self, now):
+        """Release readings whose gap has filled, overflowed the buffer or timed out"""
+        released = []
+        while self.pending and (self.pending[0][0] == self.next_seq
+                                or len(self.pending) > self.depth
+                                or now - self.pending[0][1] > self.max_wait):
+            seq, arrived, ready = heapq.heappop(self.pending)
+            if seq > self.next_seq:
+                self.stats['skipped'] += seq - self.next_seq
+            self.next_seq = seq + 1
+            released.append(ready)
+        return released
+
+# Per-board ingest state, allocated by create_app()
+ingest_lock = threading.Lock()
+sequence_trackers = {}
+latest_reading_epoch = {}
+ingest_stats = {}
+
+# Device timestamps before 2020 mean the board has no NTP time yet
+MIN_DEVICE_TIMESTAMP = 1577836800
+MAX_CLOCK_SKEW = 300
+
+def init_ingest(window, depth, max_wait):
+    """Reset duplicate/reorder tracking for every known board"""
+    for board in sensor_data:
+        sequence_trackers[board] = SequenceTracker(window, depth, max_wait)
+        latest_reading_epoch[board] = 0
+        ingest_stats[board] = {'late': 0}
+
+# Report-by-exception storage: metric -> (kind, threshold), kind 'abs' or 'pct'
+deadband_settings = {'thresholds': {}, 'heartbeat': 300.0}
+deadband_last = {}
+deadband_stats = {'stored': 0, 'suppressed': 0}
+
+def init_deadband(setting, heartbeat):
+    """Parse 'metric:threshold' pairs, e.g. 'temperature:0.2,light_level:5%'"""
+    thresholds = {}
+    for entry in filter(None, (item.strip() for item in setting.split(','))):
+        metric, _, threshold = entry.partition(':')
+        threshold = threshold.strip()
+        if threshold.endswith('%'):
+            thresholds[metric.strip()] = ('pct', float(threshold[:-1]))
+        else:
+            thresholds[metric.strip()] = ('abs', float(threshold or 0))
+    deadband_settings['thresholds'] = thresholds
+    deadband_settings['heartbeat'] = heartbeat
+    deadband_last.clear()
+
+def apply_deadband(board, epoch, values):
+    """Return values with unchanged metrics replaced by None.
+    
+    A metric is stored when it moves beyond its threshold (any change by
+    default) or has not been stored for DEADBAND_HEARTBEAT seconds, so the
+    step function through stored rows reproduces the series within the threshold.
+    Call commit_deadband after a successful write; until then the previous
+    reference point stays, so a failed write is retried on the next reading.
+    """
+    result = {}
+    for metric, value in values.items():
+        if value is None or (metric in ('temperature', 'humidity') and value == 0):
+            result[metric] = value
+            continue
+        key = (board, metric)
+        last = deadband_last.get(key)
+        store = last is None or epoch < last[1] or epoch - last[1] >= deadband_settings['heartbeat']
+        if not store:
+            kind, threshold = deadband_settings['thresholds'].get(metric, ('abs', 0.0))
+            change = abs(value - last[0])
+            if kind == 'pct':
+                threshold = abs(last[0]) * threshold / 100
+            store = change > threshold
+        if store:
+            result[metric] = value
+        else:
+            deadband_stats['suppressed'] += 1
+            result[metric] = None
+    return result
+
+def commit_deadband(board, epoch, stored):
+    """Move the reference points once the values returned by apply_deadband are written"""
+    for metric, value in stored.items():
+        if value is None or (metric in ('temperature', 'humidity') and value == 0):
+            continue
+        key = (board, metric)
+        last = deadband_last.get(key)
+        # Late readings are stored but do not move the reference point
+        if last is None or epoch >= last[1]:
+            deadband_last[key] = (value, epoch)
+        deadband_stats['stored'] += 1
+
+class TokenBucket:
+    """Token bucket allowing `burst` requests at once, refilled at `rate` per second"""
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+    
+    def take(self, now):
+        """Consume a token; return 0 if allowed, else seconds until one is available"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+    
+    def idle(self, now):
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+# Control command throttling and debouncing, configured by create_app()
+control_lock = threading.Lock()
+control_settings = {'client_rate': 5.0, 'client_burst': 10, 'device_rate': 2.0, 'device_burst': 5, 'debounce': 0.25}
+client_buckets = {}
+device_buckets = {}
+pending_commands = {}
+control_stats = {'accepted': 0, 'throttled_client': 0, 'throttled_device': 0, 'debounced': 0, 'published': 0, 'skipped': 0}
+MAX_CLIENT_BUCKETS = 1024
+
+def init_control(client_rate, client_burst, device_rate, device_burst, debounce_ms):
+    with control_lock:
+        control_settings.update({
+            'client_rate': client_rate,
+            'client_burst': client_burst,
+            'device_rate': device_rate,
+            'device_burst': device_burst,
+            'debounce': debounce_ms / 1000
+        })
+        client_buckets.clear()
+        device_buckets.clear()
+
+# Live diagnosis, /debug routes are only served when DEBUG_PROFILER is enabled
+sampling_profiler = SamplingProfiler()
+ingest_timings = IngestTimings()
+
+# Sensor history tables: (table, metric name, value column, column type)
+SENSOR_TABLES = [
+    ('motion_sensor_data', 'motion', 'motion_detected', 'BOOLEAN'),
+    ('temperature_data', 'temperature', 'temperature', 'REAL'),
+    ('humidity_data', 'humidity', 'humidity', 'REAL'),
+    ('light_sensor_data', 'light_level', 'light_level', 'INTEGER'),
+]
+
 # Initialize device status from database or default values
 def initialize_device_status():
+    """Open the database, check the schema and load persisted device status"""
     try:
-        conn = sqlite3.connect('iot_data.db')
+        conn = sqlite3.connect(dbPath)
         cursor = conn.cursor()
         
+        # WAL lets long-running /export reads proceed without blocking ingest writes
+        cursor.execute('PRAGMA journal_mode=WAL')
+        
         # Create device_status table if not exists
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS device_status (
@@ -66,6 +496,23 @@ def initialize_device_status():
             )
         ''')
         
+        # Sensor tables (simplified schema)
+        for table, metric, column, column_type in SENSOR_TABLES:
+            cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS {table} (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    board TEXT,
+                    timestamp TEXT NOT NULL,
+                    {column} {column_type}
+                )
+            ''')
+            # Older databases were created without the board column
+            cursor.execute(f'PRAGMA table_info({table})')
+            if 'board' not in [col[1] for col in cursor.fetchall()]:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN board TEXT')
+            # Time-range index used by /export
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_timestamp ON {table} (timestamp)')
+        
         # Insert default values if table is empty
         cursor.execute('SELECT COUNT(*) FROM device_status')
         if cursor.fetchone()[0] == 0:
@@ -84,15 +531,18 @@ def initialize_device_status():
                 board, device = parts[0], parts[1]
                 if board in device_status:
                     device_status[board][device] = row[1]
+                    update_summary_device(board, device, row[1])
         
         conn.commit()
         conn.close()
         print("Device status initialized from database")
+        return True
     except Exception as e:
         print(f"Error initializing device status: {e}")
         # Use default values if database fails
         for board in ['esp32', 'esp8266']:
             device_status[board] = {'light': 'off', 'light2': 'off'}
+        return False
 
 # Global MQTT connection flag
 mqtt_connected = False
@@ -123,6 +573,10 @@ def on_disconnect(client, userdata, rc):
         print("🔄 Unexpected disconnection. Will auto-reconnect...")
 
 def on_message(client, userdata, msg):
+    with ingest_timings.section('on_message'):
+        process_message(client, userdata, msg)
+
+def process_message(client, userdata, msg):
     global device_status, sensor_data
     print(f"📡 Received MQTT message: {msg.topic} -> {msg.payload.decode()}")
     try:
@@ -135,73 +589,148 @@ def on_message(client, userdata, msg):
             device = topic_parts[2]  # light, light2
             if board in device_status and device in device_status[board]:
                 device_status[board][device] = payload.lower()
-                update_device_status_in_db(f"{board}_{device}", payload.lower())
+                with ingest_timings.section('update_device_status_in_db'):
+                    update_device_status_in_db(f"{board}_{device}", payload.lower())
+                update_summary_device(board, device, payload.lower())
                 print(f"✅ Updated {board} {device} status: {payload.lower()}")
         
         # Handle sensor data (board/sensors)
         elif len(topic_parts) == 2 and topic_parts[1] == 'sensors':
             board = topic_parts[0]  # esp32 or esp8266
-            timestamp = datetime.now().isoformat()
+            received_at = time.time()
             
             print(f"🔍 DEBUG: Received sensor data from {board}: {payload}")
             
-            # Try JSON format first
-            try:
-                import json
-                sensor_json = json.loads(payload)
-                print(f"📋 JSON format detected: {sensor_json}")
-                
-                # Extract values from JSON
-                motion = sensor_json.get('motion', 0) == 1
-                humidity = float(sensor_json.get('humidity', 0))
-                light_level = int(sensor_json.get('light_level', 0))
-                temperature = float(sensor_json.get('temperature', 0))
-                
-                # Update real sensor data
-                sensor_data[board]['motion'] = motion
-                sensor_data[board]['humidity'] = humidity
-                sensor_data[board]['light_level'] = light_level
-                sensor_data[board]['temperature'] = temperature
-                sensor_data[board]['timestamp'] = timestamp
-                
-                print(f"🌡️ JSON {board.upper()} Sensors - Motion: {motion}, Temp: {temperature}°C, Humidity: {humidity}%, Light: {light_level}")
-                
-                # Store to database
-                store_sensor_data(board, timestamp, motion, humidity, light_level, temperature)
-                
-            except json.JSONDecodeError:
-                # Fallback to CSV format
-                print(f"🔄 JSON failed, trying CSV format: {payload}")
-                parts = payload.split(",")
-                
-                if board in ['esp32', 'esp8266'] and len(parts) == 4:
-                    # Both boards: motion,humidity,light_level,temperature
-                    motion = int(parts[0]) == 1
-                    humidity = float(parts[1])
-                    light_level = int(parts[2])
-                    temperature = float(parts[3])
+            with ingest_timings.section('parse'):
+                # Try JSON format first
+                try:
+                    sensor_json = json.loads(payload)
+                    print(f"📋 JSON format detected: {sensor_json}")
                     
-                    # Update real sensor data
-                    sensor_data[board]['motion'] = motion
-                    sensor_data[board]['humidity'] = humidity
-                    sensor_data[board]['light_level'] = light_level
-                    sensor_data[board]['temperature'] = temperature
-                    sensor_data[board]['timestamp'] = timestamp
-                    
-                    print(f"🌡️ CSV {board.upper()} Sensors - Motion: {motion}, Temp: {temperature}°C, Humidity: {humidity}%, Light: {light_level}")
+                    # Extract values from JSON (seq/ts/boot are sent by newer firmware)
+                    reading = {
+                        'motion': sensor_json.get('motion', 0) == 1,
+                        'humidity': float(sensor_json.get('humidity', 0)),
+                        'light_level': int(sensor_json.get('light_level', 0)),
+                        'temperature': float(sensor_json.get('temperature', 0)),
+                        'seq': sensor_json.get('seq'),
+                        'ts': sensor_json.get('ts'),
+                        'boot': sensor_json.get('boot')
+                    }
+                    source = 'JSON'
+                
+                except json.JSONDecodeError:
+                    # Fallback to CSV format
+                    print(f"🔄 JSON failed, trying CSV format: {payload}")
+                    parts = payload.split(",")
                     
-                    # Store to database
-                    store_sensor_data(board, timestamp, motion, humidity, light_level, temperature)
-                else:
-                    print(f"⚠️ Invalid CSV sensor data format from {board}: {payload}")
+                    if board in ['esp32', 'esp8266'] and len(parts) in (4, 6, 7):
+                        # Both boards: motion,humidity,light_level,temperature[,seq,ts[,boot]]
+                        reading = {
+                            'motion': int(parts[0]) == 1,
+                            'humidity': float(parts[1]),
+                            'light_level': int(parts[2]),
+                            'temperature': float(parts[3]),
+                            'seq': parts[4] if len(parts) >= 6 else None,
+                            'ts': parts[5] if len(parts) >= 6 else None,
+                            'boot': parts[6] if len(parts) == 7 else None
+                        }
+                        source = 'CSV'
+                    else:
+                        print(f"⚠️ Invalid CSV sensor data format from {board}: {payload}")
+                        return
+            
+            reading['received_at'] = received_at
+            ingest_sensor_reading(board, reading, source)
                 
     except Exception as e:
         print(f"❌ Error processing MQTT message: {e}")
 
+def ingest_sensor_reading(board, reading, source):
+    """Drop duplicates, restore device order, then apply each released reading"""
+    if board not in sensor_data:
+        print(f"⚠️ Sensor data from unknown board: {board}")
+        return
+    with ingest_lock:
+        if reading['seq'] is None:
+            # Legacy firmware without sequence numbers
+            ready = [reading]
+        else:
+            with ingest_timings.section('sequence_tracker'):
+                ready = sequence_trackers[board].push(int(reading['seq']), reading, reading['received_at'], reading['boot'])
+            if sequence_trackers[board].last_was_duplicate:
+                print(f"♻️ Duplicate {board} reading seq={reading['seq']} dropped")
+        for released in ready:
+            apply_sensor_reading(board, released, source)
+
+def reorder_flush_loop(interval):
+    """Release held readings of boards that stopped sending before their gap filled"""
+    # REORDER_WAIT=0 would spin on ingest_lock
+    interval = max(interval, 0.5)
+    while True:
+        time.sleep(interval)
+        try:
+            with ingest_lock:
+                for board, tracker in sequence_trackers.items():
+                    for released in tracker.drain(time.time()):
+                        apply_sensor_reading(board, released, 'HELD')
+        except Exception as e:
+            print(f"❌ Error flushing reorder buffer: {e}")
+
+def apply_sensor_reading(board, reading, source):
+    """Update live state, history and storage for one unique reading"""
+    # Prefer the device clock when it is synchronized (NTP), else time of receipt
+    epoch = reading['received_at']
+    try:
+        device_ts = float(reading['ts']) if reading['ts'] is not None else None
+    except ValueError:
+        device_ts = None
+    if device_ts and MIN_DEVICE_TIMESTAMP < device_ts < epoch + MAX_CLOCK_SKEW:
+        epoch = device_ts
+    timestamp = datetime.fromtimestamp(epoch).isoformat()
+    motion = reading['motion']
+    humidity = reading['humidity']
+    light_level = reading['light_level']
+    temperature = reading['temperature']
+    
+    # A late reading goes to history but must not overwrite newer live values
+    late = epoch < latest_reading_epoch.get(board, 0)
+    if late:
+        ingest_stats[board]['late'] += 1
+    else:
+        latest_reading_epoch[board] = epoch
+        
+        # Update real sensor data
+        sensor_data[board]['motion'] = motion
+        sensor_data[board]['humidity'] = humidity
+        sensor_data[board]['light_level'] = light_level
+        sensor_data[board]['temperature'] = temperature
+        sensor_data[board]['timestamp'] = timestamp
+        with ingest_timings.section('summary'):
+            update_summary_reading(board, epoch, motion, humidity, temperature)
+    
+    print(f"🌡️ {source} {board.upper()} Sensors - Motion: {motion}, Temp: {temperature}°C, Humidity: {humidity}%, Light: {light_level}{' (late)' if late else ''}")
+    
+    # Store changed metrics to database, every reading to recent history
+    with ingest_timings.section('deadband'):
+        stored = apply_deadband(board, epoch, {
+            'motion': motion,
+            'humidity': humidity,
+            'light_level': light_level,
+            'temperature': temperature
+        })
+    if any(value is not None for value in stored.values()):
+        with ingest_timings.section('store_sensor_data'):
+            written = store_sensor_data(board, timestamp, stored['motion'], stored['humidity'], stored['light_level'], stored['temperature'])
+        if written:
+            commit_deadband(board, epoch, stored)
+    with ingest_timings.section('recent_history'):
+        record_recent_history(board, epoch, motion, humidity, light_level, temperature)
+
 def update_device_status_in_db(device_name, status):
     """Update device status in database"""
     try:
-        conn = sqlite3.connect('iot_data.db')
+        conn = sqlite3.connect(dbPath)
         cursor = conn.cursor()
         cursor.execute('''
             INSERT OR REPLACE INTO device_status (device_name, status, updated_at)
@@ -214,16 +743,15 @@ def update_device_status_in_db(device_name, status):
 
 def store_sensor_data(board, timestamp, motion, humidity, light_level, temperature):
     try:
-        db_path = os.getenv('DATABASE_PATH', 'iot_data.db')
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(dbPath)
         cursor = conn.cursor()
         
         # Store motion data with simplified schema (backwards compatible)
         if motion is not None:
             try:
                 cursor.execute(
-                    "INSERT INTO motion_sensor_data (timestamp, motion_detected) VALUES (?, ?)",
-                    (timestamp, motion)
+                    "INSERT INTO motion_sensor_data (board, timestamp, motion_detected) VALUES (?, ?, ?)",
+                    (board, timestamp, motion)
                 )
             except sqlite3.OperationalError:
                 # Fallback for different schema
@@ -236,8 +764,8 @@ def store_sensor_data(board, timestamp, motion, humidity, light_level, temperatu
         if temperature is not None and temperature != 0:
             try:
                 cursor.execute(
-                    "INSERT INTO temperature_data (timestamp, temperature) VALUES (?, ?)",
-                    (timestamp, temperature)
+                    "INSERT INTO temperature_data (board, timestamp, temperature) VALUES (?, ?, ?)",
+                    (board, timestamp, temperature)
                 )
             except sqlite3.OperationalError:
                 # Fallback for different schema
@@ -250,8 +778,8 @@ def store_sensor_data(board, timestamp, motion, humidity, light_level, temperatu
         if humidity is not None and humidity != 0:
             try:
                 cursor.execute(
-                    "INSERT INTO humidity_data (timestamp, humidity) VALUES (?, ?)",
-                    (timestamp, humidity)
+                    "INSERT INTO humidity_data (board, timestamp, humidity) VALUES (?, ?, ?)",
+                    (board, timestamp, humidity)
                 )
             except sqlite3.OperationalError:
                 # Fallback for different schema  
@@ -264,8 +792,8 @@ def store_sensor_data(board, timestamp, motion, humidity, light_level, temperatu
         if light_level is not None:
             try:
                 cursor.execute(
-                    "INSERT INTO light_sensor_data (timestamp, light_level) VALUES (?, ?)",
-                    (timestamp, light_level)
+                    "INSERT INTO light_sensor_data (board, timestamp, light_level) VALUES (?, ?, ?)",
+                    (board, timestamp, light_level)
                 )
             except sqlite3.OperationalError:
                 # Fallback for different schema
@@ -276,8 +804,234 @@ def store_sensor_data(board, timestamp, motion, humidity, light_level, temperatu
         
         conn.commit()
         conn.close()
+        return True
     except Exception as e:
         print("Error storing sensor data:", e)
+        return False
+
+# Export formats: format name -> (content type, file extension, gzip compressed)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv', False),
+    'csv.gz': ('application/gzip', 'csv.gz', True),
+    'ndjson': ('application/x-ndjson', 'ndjson', False),
+    'ndjson.gz': ('application/gzip', 'ndjson.gz', True),
+    'columnar': ('application/gzip', 'columnar.json.gz', True),
+}
+EXPORT_FETCH_SIZE = 1000
+EXPORT_COLUMNS = ['timestamp', 'board', 'metric', 'value']
+
+def normalize_timestamp(value, end_of_day=False):
+    """Parse an ISO timestamp into the stored format (local time, 'T' separator).
+    
+    A bare date is the start of that day, or its last instant with end_of_day
+    so an inclusive upper bound covers the whole day.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid timestamp: {value}')
+    if end_of_day and 'T' not in value and ' ' not in value:
+        parsed = parsed.replace(hour=23, minute=59, second=59, microsecond=999999)
+    if parsed.tzinfo is not None:
+        # Stored timestamps are naive local time
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed.isoformat()
+
+def iter_sensor_rows(board=None, start=None, end=None):
+    """Yield (timestamp, board, metric, value) rows from all sensor tables in time order.
+    
+    Each table is read through its own cursor using the timestamp index and the
+    sorted streams are merged lazily, so memory use does not grow with the range.
+    """
+    conn = sqlite3.connect(f"file:{dbPath}?mode=ro", uri=True, check_same_thread=False)
+    try:
+        conditions = []
+        params = []
+        if board:
+            conditions.append('board = ?')
+            params.append(board)
+        if start:
+            conditions.append('timestamp >= ?')
+            params.append(start)
+        if end:
+            conditions.append('timestamp <= ?')
+            params.append(end)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        
+        def table_rows(table, metric, column):
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT timestamp, board, ?, {column} FROM {table} {where} ORDER BY timestamp",
+                [metric] + params
+            )
+            while True:
+                batch = cursor.fetchmany(EXPORT_FETCH_SIZE)
+                if not batch:
+                    break
+                yield from batch
+        
+        streams = [table_rows(table, metric, column) for table, metric, column, column_type in SENSOR_TABLES]
+        yield from heapq.merge(*streams, key=lambda row: row[0])
+    finally:
+        conn.close()
+
+def resample_step(rows, step, start=None, end=None, max_age=None):
+    """Rebuild regular series from deadband-compressed rows by step interpolation.
+    
+    At every `step` seconds each (board, metric) series reports its last stored
+    value, unless nothing was stored for longer than `max_age` (device silent).
+    Consumes time-ordered rows lazily; memory is one value per series.
+    """
+    last = {}
+    grid = datetime.fromisoformat(start).timestamp() if start else None
+    stop = datetime.fromisoformat(end).timestamp() if end else None
+    
+    def emit_until(limit):
+        nonlocal grid
+        while grid is not None and grid < limit and (stop is None or grid <= stop):
+            timestamp = datetime.fromtimestamp(grid).isoformat()
+            for (board, metric), (epoch, value) in sorted(last.items(), key=lambda item: (item[0][0] or '', item[0][1])):
+                if max_age is None or grid - epoch <= max_age:
+                    yield (timestamp, board, metric, value)
+            grid += step
+    
+    for timestamp, board, metric, value in rows:
+        epoch = datetime.fromisoformat(timestamp).timestamp()
+        if grid is None:
+            grid = epoch - epoch % step
+        yield from emit_until(epoch)
+        last[(board, metric)] = (epoch, value)
+    if grid is not None:
+        # Include the final grid point at or after the last stored row
+        yield from emit_until(stop + step if stop is not None else grid + step)
+
+def encode_export(rows, fmt):
+    """Encode sensor rows as a stream of byte chunks in the requested export format"""
+    content_type, extension, compressed = EXPORT_FORMATS[fmt]
+    
+    def chunks():
+        if fmt.startswith('csv'):
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_COLUMNS)
+            for i, row in enumerate(rows, 1):
+                writer.writerow(row)
+                if i % EXPORT_FETCH_SIZE == 0:
+                    yield buffer.getvalue().encode()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue().encode()
+        elif fmt.startswith('ndjson'):
+            lines = []
+            for row in rows:
+                lines.append(json.dumps(dict(zip(EXPORT_COLUMNS, row))))
+                if len(lines) == EXPORT_FETCH_SIZE:
+                    yield ('\n'.join(lines) + '\n').encode()
+                    lines = []
+            if lines:
+                yield ('\n'.join(lines) + '\n').encode()
+        else:
+            # Columnar: one JSON object of column arrays per batch of rows
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == EXPORT_FETCH_SIZE:
+                    yield (json.dumps(dict(zip(EXPORT_COLUMNS, map(list, zip(*batch))))) + '\n').encode()
+                    batch = []
+            if batch:
+                yield (json.dumps(dict(zip(EXPORT_COLUMNS, map(list, zip(*batch))))) + '\n').encode()
+    
+    if not compressed:
+        yield from chunks()
+        return
+    
+    # gzip container (wbits 16+), flushed per chunk so output streams steadily
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks():
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def submit_control_command(board, device, action, client):
+    """Rate limit a control command, then publish it after the debounce window.
+    
+    Returns None when accepted, or an error response when throttled. Toggles for
+    the same device within CONTROL_DEBOUNCE_MS collapse into the final state.
+    """
+    now = time.monotonic()
+    with control_lock:
+        bucket = client_buckets.get(client)
+        if bucket is None:
+            if len(client_buckets) >= MAX_CLIENT_BUCKETS:
+                # Forget clients whose bucket has refilled completely
+                for key in [key for key, value in client_buckets.items() if value.idle(now)]:
+                    del client_buckets[key]
+            bucket = client_buckets[client] = TokenBucket(control_settings['client_rate'], control_settings['client_burst'])
+        retry_after = bucket.take(now)
+        if retry_after:
+            control_stats['throttled_client'] += 1
+            return throttled_response('Too many control requests', retry_after)
+        
+        # Only commands that open a new publish are charged to the device; ones
+        # merging into a pending command never reach the board
+        pending = pending_commands.get((board, device))
+        if pending is None or control_settings['debounce'] <= 0:
+            bucket = device_buckets.setdefault((board, device), TokenBucket(control_settings['device_rate'], control_settings['device_burst']))
+            retry_after = bucket.take(now)
+            if retry_after:
+                control_stats['throttled_device'] += 1
+                return throttled_response(f'Too many commands for {board} {device}', retry_after)
+        control_stats['accepted'] += 1
+        
+        # Update local status immediately for web interface
+        previous = device_status[board][device]
+        device_status[board][device] = action
+        update_summary_device(board, device, action)
+        
+        if control_settings['debounce'] <= 0:
+            pending_commands[(board, device)] = {'action': action, 'previous': previous, 'count': 1}
+        elif pending:
+            pending['action'] = action
+            pending['count'] += 1
+            control_stats['debounced'] += 1
+            return None
+        else:
+            pending_commands[(board, device)] = {'action': action, 'previous': previous, 'count': 1}
+            timer = threading.Timer(control_settings['debounce'], publish_control_command, args=(board, device))
+            timer.daemon = True
+            timer.start()
+            return None
+    publish_control_command(board, device)
+    return None
+
+def publish_control_command(board, device):
+    """Publish the final state of a debounced command and persist it"""
+    with control_lock:
+        pending = pending_commands.pop((board, device), None)
+    if pending is None:
+        return
+    action = pending['action']
+    if pending['count'] > 1 and action == pending['previous']:
+        # Rapid toggles cancelled out, nothing to send
+        control_stats['skipped'] += 1
+        print(f"🔍 DEBUG: {board}_{device} toggled back to {action}, publish skipped")
+        return
+    
+    topic = f"{board}/control/{device}"
+    print(f"🔍 DEBUG: Publishing to MQTT topic: {topic} with message: {action}")
+    result = mqttClient.publish(topic, action)
+    print(f"🔍 DEBUG: MQTT publish result - rc: {result.rc}, mid: {result.mid}")
+    control_stats['published'] += 1
+    update_device_status_in_db(f"{board}_{device}", action)
+
+def throttled_response(message, retry_after):
+    response = jsonify({'status': 'error', 'message': message, 'retry_after': round(retry_after, 2)})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+    return response
 
 @app.route('/')
 def index():
@@ -295,15 +1049,9 @@ def control_board(board):
     print(f"🔍 DEBUG: Control request - Board: {board}, Device: {device}, Action: {action}")
     
     if action in ['on', 'off'] and device in device_status[board]:
-        topic = f"{board}/control/{device}"
-        print(f"🔍 DEBUG: Publishing to MQTT topic: {topic} with message: {action}")
-        
-        result = mqttClient.publish(topic, action)
-        print(f"🔍 DEBUG: MQTT publish result - rc: {result.rc}, mid: {result.mid}")
-        
-        # Update local status immediately for web interface
-        device_status[board][device] = action
-        update_device_status_in_db(f"{board}_{device}", action)
+        throttled = submit_control_command(board, device, action, request.remote_addr)
+        if throttled:
+            return throttled
         
         print(f"🔍 DEBUG: Updated {board}_{device} status to: {action}")
         return jsonify({'status': 'success', 'action': action, 'board': board, 'device': device})
@@ -317,12 +1065,9 @@ def control():
     # Backward compatibility - defaults to esp8266
     action = request.json.get('action', '').lower()
     if action in ['on', 'off']:
-        topic = f"esp8266/control/light"
-        mqttClient.publish(topic, action)
-        
-        # Update local status immediately for web interface
-        device_status['esp8266']['light'] = action
-        update_device_status_in_db('esp8266_light', action)
+        throttled = submit_control_command('esp8266', 'light', action, request.remote_addr)
+        if throttled:
+            return throttled
         
         return jsonify({'status': 'success', 'action': action})
     return jsonify({'status': 'error', 'message': 'Invalid action'})
@@ -332,16 +1077,30 @@ def control_light2():
     # Backward compatibility - defaults to esp8266
     action = request.json.get('action', '').lower()
     if action in ['on', 'off']:
-        topic = f"esp8266/control/light2"
-        mqttClient.publish(topic, action)
-        
-        # Update local status immediately for web interface
-        device_status['esp8266']['light2'] = action
-        update_device_status_in_db('esp8266_light2', action)
+        throttled = submit_control_command('esp8266', 'light2', action, request.remote_addr)
+        if throttled:
+            return throttled
         
         return jsonify({'status': 'success', 'action': action})
     return jsonify({'status': 'error', 'message': 'Invalid action'})
 
+@app.route('/control_stats')
+def get_control_stats():
+    """Throttling and debouncing counters for the control endpoints"""
+    with control_lock:
+        return jsonify({
+            'stats': control_stats,
+            'pending': [f"{board}/{device}" for board, device in pending_commands],
+            'tracked_clients': len(client_buckets),
+            'limits': {
+                'client_rate': control_settings['client_rate'],
+                'client_burst': control_settings['client_burst'],
+                'device_rate': control_settings['device_rate'],
+                'device_burst': control_settings['device_burst'],
+                'debounce_ms': int(control_settings['debounce'] * 1000)
+            }
+        })
+
 @app.route('/device_status')
 def get_device_status():
     return jsonify(device_status)
@@ -359,6 +1118,11 @@ def get_mqtt_status():
             'broker': mqttBroker,
             'port': mqttPort,
             'last_sensor_update': sensor_data.get('esp32', {}).get('timestamp', 'No data'),
+            'ingest': {
+                board: dict(tracker.stats, late=ingest_stats[board]['late'])
+                for board, tracker in sequence_trackers.items()
+            },
+            'storage': deadband_stats,
             'message': 'MQTT Connected' if mqtt_connected else 'MQTT Disconnected - Check ESP32 connection'
         })
     except Exception as e:
@@ -369,6 +1133,17 @@ def get_mqtt_status():
             'message': 'MQTT Connection Error'
         })
 
+@app.route('/ready')
+def get_ready():
+    """Readiness probe: 200 once the database is initialized and MQTT is connected"""
+    ready = startup_state['database_ready'] and mqtt_connected
+    return jsonify({
+        'ready': ready,
+        'database_ready': startup_state['database_ready'],
+        'mqtt_connected': mqtt_connected,
+        'startup': startup_state
+    }), 200 if ready else 503
+
 @app.route('/sensor_data')
 def get_sensor_data():
     """Get real-time sensor data from ESP32/ESP8266 hardware only"""
@@ -396,6 +1171,153 @@ def get_sensor_data():
             'esp8266': {'motion': False, 'humidity': 0, 'light_level': 0, 'temperature': 0, 'timestamp': 'Error'}
         })
 
+@app.route('/summary')
+def get_summary():
+    """Fleet overview from the incrementally maintained summary cache"""
+    now = time.time()
+    with summary_lock:
+        # Windowed stats are refreshed at most once per TTL
+        if now - summary_windowed['computed_at'] > summary_settings['ttl']:
+            summary_windowed['motion_events'] = {
+                room: stats['motion'].expire(now) for room, stats in summary_rooms.items()
+            }
+            summary_windowed['computed_at'] = now
+        rooms = {}
+        for room, stats in summary_rooms.items():
+            rooms[room] = {
+                'boards': stats['boards'],
+                'avg_temperature': round(stats['temperature_sum'] / stats['temperature_count'], 1) if stats['temperature_count'] else None,
+                'avg_humidity': round(stats['humidity_sum'] / stats['humidity_count'], 1) if stats['humidity_count'] else None,
+                'motion_events': summary_windowed['motion_events'].get(room, 0)
+            }
+        on = sorted(devices_on)
+    return jsonify({
+        'rooms': rooms,
+        'boards_on': sorted({board for board, device in on}),
+        'devices_on': [f"{board}/{device}" for board, device in on],
+        'motion_window_seconds': summary_settings['motion_window'],
+        'windowed_stats_at': datetime.fromtimestamp(summary_windowed['computed_at']).isoformat()
+    })
+
+@app.route('/recent/<board>')
+def get_recent(board):
+    """Sparkline data for the last hours of a board, served from memory without database reads"""
+    if board not in recent_history:
+        return jsonify({'status': 'error', 'message': 'Invalid board'}), 400
+    try:
+        hours = float(request.args.get('hours', 1))
+    except ValueError:
+        hours = 0
+    if not math.isfinite(hours) or hours <= 0:
+        return jsonify({'status': 'error', 'message': 'Invalid hours'}), 400
+    hours = min(hours, app.config['RECENT_HOURS'])
+    metrics = request.args.get('metric')
+    metrics = metrics.split(',') if metrics else list(recent_history[board])
+    if any(metric not in recent_history[board] for metric in metrics):
+        return jsonify({'status': 'error', 'message': 'Invalid metric'}), 400
+    
+    now = time.time()
+    since = now - hours * 3600
+    with recent_history_lock:
+        rings = recent_history[board]
+        bucket_seconds = rings[metrics[0]].bucket_seconds
+        series = {metric: rings[metric].series(since, now) for metric in metrics}
+    return jsonify({
+        'board': board,
+        'hours': hours,
+        'bucket_seconds': bucket_seconds,
+        'metrics': series
+    })
+
+@app.route('/export')
+def export_sensor_data():
+    """Stream sensor history as CSV, NDJSON or columnar batches, optionally gzip compressed"""
+    board = request.args.get('board') or None
+    start = request.args.get('from') or None
+    end = request.args.get('to') or None
+    fmt = request.args.get('format', 'csv').lower()
+    step = request.args.get('step')
+    
+    if step:
+        try:
+            step = float(step)
+        except ValueError:
+            step = 0
+        if step <= 0:
+            return jsonify({'status': 'error', 'message': 'Invalid step'}), 400
+    if board and board not in device_status:
+        return jsonify({'status': 'error', 'message': 'Invalid board'}), 400
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'status': 'error', 'message': f"Invalid format, expected one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    try:
+        start = normalize_timestamp(start)
+        end = normalize_timestamp(end, end_of_day=True)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    
+    content_type, extension, compressed = EXPORT_FORMATS[fmt]
+    filename = f"sensor_data_{board or 'all'}.{extension}"
+    print(f"📦 Export requested - Board: {board or 'all'}, From: {start}, To: {end}, Format: {fmt}")
+    if step:
+        # Regular series reconstructed from report-by-exception rows. A heartbeat
+        # row is written by the first reading after the heartbeat expires, so
+        # allow twice the heartbeat before treating a series as silent, and read
+        # back as far so values in effect at `from` are known
+        max_age = 2 * deadband_settings['heartbeat']
+        lookback = datetime.fromtimestamp(datetime.fromisoformat(start).timestamp() - max_age).isoformat() if start else None
+        rows = resample_step(iter_sensor_rows(board, lookback, end), step, start, end, max_age)
+    else:
+        rows = iter_sensor_rows(board, start, end)
+    return Response(
+        encode_export(rows, fmt),
+        mimetype=content_type,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@app.route('/debug/profile')
+def debug_profile():
+    """Sample all thread stacks for ?seconds= and return collapsed stacks for flamegraphs"""
+    if not app.config.get('DEBUG_PROFILER'):
+        return jsonify({'status': 'error', 'message': 'Profiler disabled, set DEBUG_PROFILER=True'}), 404
+    try:
+        seconds = float(request.args.get('seconds', 5))
+        interval_ms = float(request.args['interval_ms']) if 'interval_ms' in request.args else None
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Invalid seconds or interval_ms'}), 400
+    if seconds <= 0:
+        return jsonify({'status': 'error', 'message': 'Invalid seconds'}), 400
+    if interval_ms is not None and interval_ms <= 0:
+        return jsonify({'status': 'error', 'message': 'Invalid interval_ms'}), 400
+    
+    print(f"🔬 Profiling all threads for {seconds}s")
+    result = sampling_profiler.sample(seconds, interval_ms / 1000 if interval_ms else None)
+    if result is None:
+        return jsonify({'status': 'error', 'message': 'A profile is already running'}), 409
+    stacks, samples = result
+    
+    if request.args.get('format', 'collapsed') == 'json':
+        return jsonify({
+            'seconds': min(seconds, sampling_profiler.max_seconds),
+            'samples': samples,
+            'stacks': dict(stacks.most_common()),
+            'ingest': ingest_timings.snapshot()
+        })
+    return Response(format_collapsed(stacks), mimetype='text/plain')
+
+@app.route('/debug/ingest_timings', methods=['GET', 'POST'])
+def debug_ingest_timings():
+    """Per-section timings of the ingest hot path; POST {"enabled": true/false, "reset": true} to toggle"""
+    if not app.config.get('DEBUG_PROFILER'):
+        return jsonify({'status': 'error', 'message': 'Profiler disabled, set DEBUG_PROFILER=True'}), 404
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        if body.get('reset'):
+            ingest_timings.reset()
+        if 'enabled' in body:
+            ingest_timings.enabled = bool(body['enabled'])
+            print(f"🔬 Ingest timings {'enabled' if ingest_timings.enabled else 'disabled'}")
+    return jsonify({'enabled': ingest_timings.enabled, 'sections': ingest_timings.snapshot()})
+
 @app.route('/simulate_sensors')
 def simulate_sensors():
     """Manual test simulation - only for testing without hardware"""
@@ -418,11 +1340,8 @@ def simulate_sensors():
     print("🧪 Manual test simulation triggered")
     return jsonify({"status": "success", "message": "Manual test data generated"})
 
-if __name__ == '__main__':
-    # Initialize device status from database
-    initialize_device_status()
-    
-    # Setup MQTT callbacks
+def start_mqtt():
+    """Configure TLS/credentials and start the MQTT network loop"""
     mqttClient.username_pw_set(mqttUser, mqttPassword)
     mqttClient.on_connect = on_connect
     mqttClient.on_message = on_message
@@ -436,14 +1355,90 @@ if __name__ == '__main__':
         mqttClient.tls_set()
         print("Using default TLS (no CA certificate)")
     
-    # Connect to MQTT broker
+    # Connect from the network thread so the TLS handshake never blocks
+    # startup, and paho keeps retrying if the broker is unreachable
     try:
         print(f"🔌 Connecting to MQTT broker: {mqttBroker}:{mqttPort}")
-        mqttClient.connect(mqttBroker, mqttPort, 60)
+        mqttClient.connect_async(mqttBroker, mqttPort, 60)
         mqttClient.loop_start()
         print("📡 MQTT client started")
     except Exception as e:
         print(f"❌ MQTT connection error: {e}")
+
+# Startup runs once per process, whether under `python app.py` or a WSGI server
+_startup_lock = threading.Lock()
+startup_state = {
+    'started_at': None,
+    'database_ready': False,
+    'database_seconds': None,
+    'mqtt_seconds': None,
+    'startup_seconds': None
+}
+
+def run_startup():
+    """Initialize the database and MQTT connection in parallel and time each step"""
+    started = time.monotonic()
+    
+    def init_database():
+        db_started = time.monotonic()
+        startup_state['database_ready'] = initialize_device_status()
+        startup_state['database_seconds'] = round(time.monotonic() - db_started, 3)
+        print(f"💾 Database ready in {startup_state['database_seconds']}s")
+    
+    db_thread = threading.Thread(target=init_database, daemon=True)
+    db_thread.start()
+    start_mqtt()
+    db_thread.join()
+    
+    # Wait for the first CONNACK so the reported time covers the TLS handshake
+    timeout = app.config['MQTT_CONNECT_TIMEOUT']
+    while not mqtt_connected and time.monotonic() - started < timeout:
+        time.sleep(0.05)
+    if mqtt_connected:
+        startup_state['mqtt_seconds'] = round(time.monotonic() - started, 3)
+        print(f"📡 MQTT connected in {startup_state['mqtt_seconds']}s")
+    else:
+        print(f"⚠️ MQTT not connected after {timeout}s, retrying in background")
+    
+    startup_state['startup_seconds'] = round(time.monotonic() - started, 3)
+    print(f"🚀 Startup finished in {startup_state['startup_seconds']}s")
+
+def create_app(config=None):
+    """Application factory: apply configuration and start background initialization.
+    
+    Returns immediately; database and MQTT setup run on a background thread and
+    /ready reports when they are done. Repeated calls in one process are no-ops.
+    """
+    global mqttBroker, mqttPort, mqttUser, mqttPassword, caCertPath, dbPath, mqttClient
+    with _startup_lock:
+        if startup_state['started_at'] is not None:
+            return app
+        
+        config = load_config(config)
+        app.config.update(config)
+        mqttBroker = config['MQTT_BROKER']
+        mqttPort = config['MQTT_PORT']
+        mqttUser = config['MQTT_USERNAME']
+        mqttPassword = config['MQTT_PASSWORD']
+        caCertPath = config['CA_CERT_PATH']
+        dbPath = config['DATABASE_PATH']
+        mqttClient = mqtt.Client()
+        init_recent_history(config['RECENT_BUCKET_SECONDS'], config['RECENT_HOURS'])
+        init_summary(config['BOARD_ROOMS'], config['SUMMARY_MOTION_WINDOW'], config['SUMMARY_TTL'])
+        init_ingest(config['DEDUP_WINDOW'], config['REORDER_DEPTH'], config['REORDER_WAIT'])
+        init_deadband(config['DEADBAND'], config['DEADBAND_HEARTBEAT'])
+        init_control(config['CONTROL_CLIENT_RATE'], config['CONTROL_CLIENT_BURST'],
+                     config['CONTROL_DEVICE_RATE'], config['CONTROL_DEVICE_BURST'], config['CONTROL_DEBOUNCE_MS'])
+        sampling_profiler.interval = config['PROFILE_INTERVAL_MS'] / 1000
+        sampling_profiler.max_seconds = config['PROFILE_MAX_SECONDS']
+        
+        startup_state['started_at'] = datetime.now().isoformat()
+        threading.Thread(target=run_startup, daemon=True).start()
+        threading.Thread(target=reorder_flush_loop, args=(config['REORDER_WAIT'],), daemon=True).start()
+    return app
+
+if __name__ == '__main__':
+    create_app()
     
     # Flask configuration from environment
     host = os.getenv('FLASK_HOST', '0.0.0.0')
@@ -452,11 +1447,12 @@ if __name__ == '__main__':
     
     print("🌐 IoT Web Control System Started!")
     print(f"📱 Web interface: https://{host}:{port}")
-    print("💾 Device status loaded from database")
     
     # Real sensor data only - no simulation
     print("📡 Waiting for real sensor data from ESP32/ESP8266...")
+    print("ℹ️ Development server only - use `gunicorn -c gunicorn.conf.py wsgi:app` in production")
     
     # Enable HTTPS
     ssl_context = (os.getenv('SSL_CERT', 'self_signed_cert.pem'), os.getenv('SSL_KEY', 'private_key.pem'))
-    app.run(host=host, port=port, debug=debug, ssl_context=ssl_context)
+    # The reloader would fork a second process with its own MQTT client
+    app.run(host=host, port=port, debug=debug, ssl_context=ssl_context, use_reloader=False)
@@ -0,0 +1,65 @@
+# HTTP load benchmark for the dashboard API
+# Usage: python benchmark.py [url] [concurrency] [duration_seconds]
+import http.client
+import ssl
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+def worker(url, deadline, results):
+    """Issue GET requests on one keep-alive connection until the deadline"""
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    ok = errors = 0
+    conn = None
+    while time.time() < deadline:
+        try:
+            if conn is None:
+                if parts.scheme == 'https':
+                    # Self-signed certificates are expected on the gateway
+                    context = ssl._create_unverified_context()
+                    conn = http.client.HTTPSConnection(parts.hostname, parts.port, timeout=10, context=context)
+                else:
+                    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=10)
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            if response.status == 200:
+                ok += 1
+            else:
+                errors += 1
+            if response.getheader('Connection', '').lower() == 'close':
+                conn.close()
+                conn = None
+        except Exception:
+            errors += 1
+            if conn is not None:
+                conn.close()
+            conn = None
+    if conn is not None:
+        conn.close()
+    results.append((ok, errors))
+
+def run(url, concurrency, duration):
+    results = []
+    deadline = time.time() + duration
+    threads = [threading.Thread(target=worker, args=(url, deadline, results)) for _ in range(concurrency)]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - start
+    ok = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    print(f"URL: {url}")
+    print(f"Concurrency: {concurrency}, duration: {elapsed:.1f}s")
+    print(f"Requests: {ok} ok, {errors} errors")
+    print(f"Throughput: {ok / elapsed:.1f} req/s")
+
+if __name__ == '__main__':
+    url = sys.argv[1] if len(sys.argv) > 1 else 'https://127.0.0.1:5000/sensor_data'
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    duration = float(sys.argv[3]) if len(sys.argv) > 3 else 10
+    run(url, concurrency, duration)
@@ -4,6 +4,7 @@
 #include <DHT.h>
 #include <WiFiClientSecure.h>
 #include <ArduinoJson.h>
+#include <time.h>
 
 // Paste your CA certificate here
 const char* ca_cert = R"EOF(
@@ -60,6 +61,8 @@ bool motionDetected = false;
 unsigned long lastMotionTime = 0;
 unsigned long sensorInterval = 2000; // Reduced from 3000ms to 2000ms - send sensor data every 2 seconds
 unsigned long lastSensorRead = 0;
+unsigned long sequenceNumber = 0;   // Lets the server drop duplicate and reorder late readings
+unsigned long bootId = 0;           // Random per boot so the server can tell a restart from a replay
 
 void setup() {
   Serial.begin(115200);
@@ -96,6 +99,8 @@ void setup() {
   
   // Setup WiFi and MQTT
   setupWiFi();
+  bootId = esp_random();
+  configTime(0, 0, "pool.ntp.org", "time.nist.gov");  // Device timestamps (UTC)
   Tuan_1.setCACert(ca_cert);
   client.setServer(mqttServer, mqttPort);
   client.setCallback(mqttCallback);
@@ -229,6 +234,12 @@ void readSensors() {
   doc["humidity"] = isnan(humidity) ? 0 : humidity;
   doc["motion"] = motionDetected ? 1 : 0;
   doc["light_level"] = lightLux;
+  doc["seq"] = sequenceNumber;
+  doc["boot"] = bootId;
+  time_t now = time(nullptr);
+  if (now > 1577836800) {  // Only send once NTP has synced
+    doc["ts"] = now;
+  }
   
   String jsonPayload;
   serializeJson(doc, jsonPayload);
@@ -237,11 +248,15 @@ void readSensors() {
   String csvPayload = String(motionDetected ? 1 : 0) + "," + 
                      String(isnan(humidity) ? 0 : humidity) + "," + 
                      String(lightLux) + "," + 
-                     String(isnan(temperature) ? 0 : temperature);
+                     String(isnan(temperature) ? 0 : temperature) + "," +
+                     String(sequenceNumber) + "," +
+                     String(now > 1577836800 ? (unsigned long)now : 0) + "," +
+                     String(bootId);
   
   // Publish both formats
   bool jsonPublished = client.publish("esp32/sensors", jsonPayload.c_str());
   bool csvPublished = client.publish("esp32/sensors_csv", csvPayload.c_str());
+  sequenceNumber++;
   
   Serial.print("📡 JSON Payload: ");
   Serial.println(jsonPayload);
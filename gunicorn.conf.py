@@ -0,0 +1,35 @@
+# Gunicorn configuration for production serving of the IoT dashboard
+# Run with: gunicorn -c gunicorn.conf.py wsgi:app
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv('config.env')
+
+bind = f"{os.getenv('FLASK_HOST', '0.0.0.0')}:{os.getenv('FLASK_PORT', 5000)}"
+
+# Device and sensor state lives in process memory and every process runs its
+# own MQTT client (and writes received readings to SQLite), so the default is
+# a single process serving requests from a thread pool. Raising WEB_WORKERS
+# duplicates MQTT subscriptions and stored sensor rows.
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_WORKERS', 1))
+threads = int(os.getenv('WEB_THREADS', 16))
+
+# Dashboard polls every few seconds, keep connections (and TLS sessions) open
+keepalive = int(os.getenv('WEB_KEEPALIVE', 30))
+timeout = 30
+graceful_timeout = 10
+
+# Never load the app in the master: the MQTT network thread must start after fork
+preload_app = False
+
+# Enable HTTPS when certificates are available
+_cert = os.getenv('SSL_CERT', 'self_signed_cert.pem')
+_key = os.getenv('SSL_KEY', 'private_key.pem')
+if os.path.exists(_cert) and os.path.exists(_key):
+    certfile = _cert
+    keyfile = _key
+
+accesslog = os.getenv('WEB_ACCESS_LOG') or None
+errorlog = '-'
@@ -0,0 +1,121 @@
+# Sampling profiler and ingest timings for live diagnosis (used by app.py /debug routes)
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+
+class SamplingProfiler:
+    """Periodically snapshots the stacks of all threads (paho network thread,
+    Flask/Gunicorn workers, background loops) and counts identical stacks.
+
+    Nothing runs between profiles: sampling happens only inside sample(), on
+    the calling thread, so the cost is zero while no profile is requested.
+    """
+    # Shortest interval allowed, so a profile never turns into a busy loop
+    MIN_INTERVAL = 0.001
+
+    def __init__(self, interval=0.005, max_seconds=60):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.lock = threading.Lock()
+
+    def sample(self, seconds, interval=None):
+        """Sample for `seconds`; return (Counter of collapsed stacks, number of samples).
+
+        Returns None if another profile is already running.
+        """
+        if not self.lock.acquire(blocking=False):
+            return None
+        try:
+            interval = max(interval or self.interval, self.MIN_INTERVAL)
+            seconds = min(seconds, self.max_seconds)
+            own_ident = threading.get_ident()
+            stacks = Counter()
+            samples = 0
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own_ident:
+                        continue
+                    stacks[collapse_stack(names.get(ident, f'thread-{ident}'), frame)] += 1
+                samples += 1
+                time.sleep(interval)
+            return stacks, samples
+        finally:
+            self.lock.release()
+
+def collapse_stack(thread_name, frame):
+    """Render a frame chain root-first in flamegraph.pl collapsed format"""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}".replace(';', ':'))
+        frame = frame.f_back
+    parts.append(thread_name.replace(';', ':'))
+    return ';'.join(reversed(parts))
+
+def format_collapsed(stacks):
+    """One 'frame;frame;frame count' line per stack, for flamegraph.pl / speedscope"""
+    return ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+class IngestTimings:
+    """Per-section wall time for the ingest hot path, toggled at runtime.
+
+    While disabled, section() returns a shared no-op context manager, so the
+    instrumented code pays only for an attribute check.
+    """
+    _disabled = nullcontext()
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    def section(self, name):
+        if not self.enabled:
+            return self._disabled
+        return _TimedSection(self, name)
+
+    def record(self, name, elapsed):
+        with self.lock:
+            entry = self.stats.get(name)
+            if entry is None:
+                entry = self.stats[name] = {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+            entry['calls'] += 1
+            entry['total_ms'] += elapsed * 1000
+            entry['max_ms'] = max(entry['max_ms'], elapsed * 1000)
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+
+    def snapshot(self):
+        """Stats per section with mean time, slowest total first"""
+        with self.lock:
+            result = {}
+            for name, entry in sorted(self.stats.items(), key=lambda item: -item[1]['total_ms']):
+                result[name] = {
+                    'calls': entry['calls'],
+                    'total_ms': round(entry['total_ms'], 3),
+                    'mean_ms': round(entry['total_ms'] / entry['calls'], 3),
+                    'max_ms': round(entry['max_ms'], 3)
+                }
+            return result
+
+class _TimedSection:
+    __slots__ = ('timings', 'name', 'started')
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timings.record(self.name, time.perf_counter() - self.started)
+        return False
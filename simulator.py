@@ -3,6 +3,7 @@ from tkinter import ttk
 import random
 import threading
 import time
+import queue
 import paho.mqtt.client as mqtt
 import json
 from datetime import datetime
@@ -44,6 +45,10 @@ class IoTSimulator:
             }
         }
         
+        # Per-board sequence numbers; boot id changes every simulator start
+        self.sequence_numbers = {'esp32': 0, 'esp8266': 0}
+        self.boot_id = random.randint(1, 2**31 - 1)
+        
         # Device status for both boards
         self.device_status = {
             'esp32': {
@@ -94,11 +99,15 @@ class IoTSimulator:
         # Connection status
         self.connection_status = tk.StringVar(value="Disconnected")
         
+        # Widget updates from background threads, applied by the Tk main loop
+        self.gui_queue = queue.Queue()
+        self.displayed = {}
+        
     def on_mqtt_connect(self, client, userdata, flags, rc):
         if rc == 0:
             print("✅ Connected to MQTT broker successfully!")
             self.mqtt_connected = True
-            self.connection_status.set("Connected ✓")
+            self.post_gui(('connection',), ("Connected ✓", True))
             
             # Subscribe to control topics (to receive commands from web)
             boards = ['esp32', 'esp8266']
@@ -110,12 +119,12 @@ class IoTSimulator:
         else:
             print(f"❌ Failed to connect to MQTT broker. Code: {rc}")
             self.mqtt_connected = False
-            self.connection_status.set("Failed ✗")
+            self.post_gui(('connection',), ("Failed ✗", False))
 
     def on_mqtt_disconnect(self, client, userdata, rc):
         print("🔄 Disconnected from MQTT broker. Attempting to reconnect...")
         self.mqtt_connected = False
-        self.connection_status.set("Reconnecting...")
+        self.post_gui(('connection',), ("Reconnecting...", False))
 
     def on_mqtt_message(self, client, userdata, msg):
         try:
@@ -133,9 +142,8 @@ class IoTSimulator:
                     # Update internal status
                     self.device_status[board][device] = payload.lower()
                     
-                    # Update GUI
-                    self.status_vars[board][device].set(payload.upper())
-                    self.update_status_label_color(board, device, payload.upper())
+                    # Update GUI (from the Tk main loop, this runs on paho's thread)
+                    self.post_gui(('status', board, device), payload.upper())
                     
                     # Publish status back to web
                     status_topic = f"{board}/status/{device}"
@@ -282,8 +290,7 @@ class IoTSimulator:
             
             # Update local status immediately
             self.device_status[board][device] = action
-            self.status_vars[board][device].set(action.upper())
-            self.update_status_label_color(board, device, action.upper())
+            self.post_gui(('status', board, device), action.upper())
             
             # Publish status update
             status_topic = f"{board}/status/{device}"
@@ -309,8 +316,10 @@ class IoTSimulator:
         # Start sensor data publishing
         threading.Thread(target=self.publish_sensor_data_loop, daemon=True).start()
         
-        # Start GUI updates
-        threading.Thread(target=self.update_gui_loop, daemon=True).start()
+        # Show initial values and start applying queued GUI updates
+        for board in self.sensor_data:
+            self.post_sensor_display(board)
+        self.root.after(0, self.process_gui_queue)
 
     def mqtt_connection_loop(self):
         """Handle MQTT connection and reconnection"""
@@ -318,7 +327,7 @@ class IoTSimulator:
             try:
                 if not self.mqtt_connected:
                     print("🔄 Attempting to connect to MQTT broker...")
-                    self.connection_status.set("Connecting...")
+                    self.post_gui(('connection',), ("Connecting...", False))
                     
                     # Enable TLS with CA certificate for EMQX
                     if os.path.exists(caCertPath):
@@ -334,7 +343,7 @@ class IoTSimulator:
             except Exception as e:
                 print(f"❌ MQTT connection error: {e}")
                 self.mqtt_connected = False
-                self.connection_status.set("Error ✗")
+                self.post_gui(('connection',), ("Error ✗", False))
                 time.sleep(10)  # Wait longer on error
 
     def publish_sensor_data_loop(self):
@@ -354,52 +363,84 @@ class IoTSimulator:
                     self.sensor_data['esp8266']['humidity'] = round(random.uniform(45, 75), 1)
                     self.sensor_data['esp8266']['light_level'] = random.randint(150, 600)
                     
-                    # Publish ESP32 sensors (motion,humidity,light)
-                    esp32_payload = f"{self.sensor_data['esp32']['motion']},{self.sensor_data['esp32']['humidity']},{self.sensor_data['esp32']['light_level']}"
+                    # Publish JSON like the firmware, with sequence number and device timestamp
+                    esp32_payload = self.build_sensor_payload('esp32')
                     self.mqtt_client.publish("esp32/sensors", esp32_payload)
                     
-                    # Publish ESP8266 sensors (motion,temperature,humidity,light) - Updated format
-                    esp8266_payload = f"{int(self.sensor_data['esp8266']['motion'])},{self.sensor_data['esp8266']['temperature']},{self.sensor_data['esp8266']['humidity']},{self.sensor_data['esp8266']['light_level']}"
+                    esp8266_payload = self.build_sensor_payload('esp8266')
                     self.mqtt_client.publish("esp8266/sensors", esp8266_payload)
                     
                     print(f"📡 ESP32 sensors: {esp32_payload}")
                     print(f"📡 ESP8266 sensors: {esp8266_payload}")
                     
+                    for board in self.sensor_data:
+                        self.post_sensor_display(board)
+                    
                 time.sleep(3)  # Publish every 3 seconds
                 
             except Exception as e:
                 print(f"❌ Error publishing sensor data: {e}")
                 time.sleep(5)
 
-    def update_gui_loop(self):
-        """Update GUI with latest sensor data"""
-        while True:
+    def build_sensor_payload(self, board):
+        """JSON sensor payload with sequence number, boot id and device timestamp"""
+        data = self.sensor_data[board]
+        payload = json.dumps({
+            'motion': int(data['motion']),
+            'humidity': data['humidity'],
+            'light_level': data['light_level'],
+            'temperature': data['temperature'],
+            'seq': self.sequence_numbers[board],
+            'boot': self.boot_id,
+            'ts': round(time.time(), 3)
+        })
+        self.sequence_numbers[board] += 1
+        return payload
+
+    def post_gui(self, key, value):
+        """Queue a widget update; safe to call from any thread"""
+        self.gui_queue.put((key, value))
+
+    def post_sensor_display(self, board):
+        """Queue the display text for every sensor of a board"""
+        data = self.sensor_data[board]
+        if board == 'esp8266':
+            motion_text = "🔴 Motion Detected!" if data['motion'] else "🟢 No Motion"
+        else:
+            motion_text = "Motion Detected" if data['motion'] else "No Motion"
+        self.post_gui(('sensor', board, 'motion'), motion_text)
+        self.post_gui(('sensor', board, 'temperature'), f"{data['temperature']:.1f}°C")
+        self.post_gui(('sensor', board, 'humidity'), f"{data['humidity']:.1f}%")
+        self.post_gui(('sensor', board, 'light'), f"{data['light_level']}")
+
+    def process_gui_queue(self):
+        """Apply queued updates on the Tk main loop, touching only widgets whose value changed"""
+        updates = {}
+        try:
+            while True:
+                key, value = self.gui_queue.get_nowait()
+                updates[key] = value  # Only the latest value per widget matters
+        except queue.Empty:
+            pass
+        
+        for key, value in updates.items():
+            if self.displayed.get(key) == value:
+                continue
             try:
-                # Update ESP32 GUI
-                motion_text = "Motion Detected" if self.sensor_data['esp32']['motion'] else "No Motion"
-                self.sensor_vars['esp32']['motion'].set(motion_text)
-                self.sensor_vars['esp32']['temperature'].set(f"{self.sensor_data['esp32']['temperature']:.1f}°C")
-                self.sensor_vars['esp32']['humidity'].set(f"{self.sensor_data['esp32']['humidity']:.1f}%")
-                self.sensor_vars['esp32']['light'].set(f"{self.sensor_data['esp32']['light_level']}")
-                
-                # Update ESP8266 GUI
-                motion_text_esp8266 = "🔴 Motion Detected!" if self.sensor_data['esp8266']['motion'] else "🟢 No Motion"
-                self.sensor_vars['esp8266']['motion'].set(motion_text_esp8266)
-                self.sensor_vars['esp8266']['temperature'].set(f"{self.sensor_data['esp8266']['temperature']:.1f}°C")
-                self.sensor_vars['esp8266']['humidity'].set(f"{self.sensor_data['esp8266']['humidity']:.1f}%")
-                self.sensor_vars['esp8266']['light'].set(f"{self.sensor_data['esp8266']['light_level']}")
-                
-                # Update connection status color
-                if self.mqtt_connected:
-                    self.status_label.config(bg="#27ae60")  # Green
-                else:
-                    self.status_label.config(bg="#e74c3c")  # Red
-                    
-                time.sleep(1)  # Update GUI every second
-                
+                if key[0] == 'sensor':
+                    self.sensor_vars[key[1]][key[2]].set(value)
+                elif key[0] == 'status':
+                    self.status_vars[key[1]][key[2]].set(value)
+                    self.update_status_label_color(key[1], key[2], value)
+                elif key[0] == 'connection':
+                    text, connected = value
+                    self.connection_status.set(text)
+                    self.status_label.config(bg="#27ae60" if connected else "#e74c3c")  # Green / Red
+                self.displayed[key] = value
             except Exception as e:
                 print(f"❌ Error updating GUI: {e}")
-                time.sleep(2)
+        
+        self.root.after(100, self.process_gui_queue)
 
     def run(self):
         """Start the simulator"""
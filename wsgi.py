@@ -0,0 +1,7 @@
+# WSGI entry point for production serving
+# Run with: gunicorn -c gunicorn.conf.py wsgi:app
+from app import create_app
+
+# Each worker process imports this module after fork, so every process
+# gets exactly one MQTT client and network loop
+app = create_app()